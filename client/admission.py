@@ -0,0 +1,350 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import itertools
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, List, Optional, Set
+
+CRITICAL_LANE = "critical"
+NORMAL_LANE = "normal"
+LOW_LANE = "low"
+LANES = (CRITICAL_LANE, NORMAL_LANE, LOW_LANE)
+
+EVENT_ACTION_LANES = {
+    "issues:opened": CRITICAL_LANE,
+    "issues:reopened": NORMAL_LANE,
+    "issues:edited": NORMAL_LANE,
+    "issue_comment:created": NORMAL_LANE,
+    "issue_comment:edited": LOW_LANE,
+    "issue_comment:deleted": LOW_LANE,
+}
+
+ADMISSION_WORKERS = int(os.getenv("ADMISSION_WORKERS", "4"))
+ADMISSION_QUEUE_WAIT_SLO_SECONDS = float(os.getenv("ADMISSION_QUEUE_WAIT_SLO_SECONDS", "30"))
+ADMISSION_DROP_AFTER_SECONDS = float(os.getenv("ADMISSION_DROP_AFTER_SECONDS", "120"))
+ADMISSION_DEFAULT_MAX_PENDING_PER_REPO = int(os.getenv("ADMISSION_DEFAULT_MAX_PENDING_PER_REPO", "20"))
+ADMISSION_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_SHUTDOWN_TIMEOUT_SECONDS", "25"))
+
+# e.g. {"owner/name": {"weight": 4, "max_pending": 50}}
+ADMISSION_REPO_LIMITS = json.loads(os.getenv("ADMISSION_REPO_LIMITS", "{}"))
+# e.g. {"12345": 2}
+ADMISSION_INSTALLATION_WEIGHTS = json.loads(os.getenv("ADMISSION_INSTALLATION_WEIGHTS", "{}"))
+
+
+class QueuedEvent:
+    """A webhook event waiting for a worker"""
+
+    __slots__ = ("repo", "installation_id", "issue_url", "event_action", "lane", "job", "sequence", "enqueued_at", "deferred")
+
+    def __init__(
+        self,
+        repo: str,
+        installation_id: str,
+        issue_url: str,
+        event_action: str,
+        lane: str,
+        job: Callable[[], None],
+        sequence: int,
+    ):
+        self.repo = repo
+        self.installation_id = installation_id
+        self.issue_url = issue_url
+        self.event_action = event_action
+        self.lane = lane
+        self.job = job
+        self.sequence = sequence
+        self.enqueued_at = time.monotonic()
+        self.deferred = False
+
+
+class _RepoQueue:
+    """Events of one repository within a lane, with the repository's virtual start tag"""
+
+    __slots__ = ("tag", "events")
+
+    def __init__(self, tag: float):
+        self.tag = tag
+        self.events: Deque[QueuedEvent] = deque()
+
+
+class _InstallationQueue:
+    """Repositories of one installation within a lane, with the installation's virtual start tag"""
+
+    __slots__ = ("tag", "virtual_time", "repos")
+
+    def __init__(self, tag: float):
+        self.tag = tag
+        self.virtual_time = 0.0
+        self.repos: Dict[str, _RepoQueue] = {}
+
+
+class _Lane:
+    """Installations with queued events in one priority lane"""
+
+    __slots__ = ("virtual_time", "installations")
+
+    def __init__(self):
+        self.virtual_time = 0.0
+        self.installations: Dict[str, _InstallationQueue] = {}
+
+
+class AdmissionController:
+    """
+    Admits webhook events into priority lanes and hands them to workers.
+
+    Lanes are served in strict priority order. Within a lane, events are scheduled by hierarchical
+    weighted fair queuing: the installation with the lowest virtual start tag is picked first, then
+    the repository with the lowest tag inside it. Tags only advance when an event is served, by
+    1 / weight, so a noisy repository only delays its own events, even when every repository shares
+    one installation.
+
+    Events of the same issue are processed one at a time and in the order they arrived, whichever
+    lane they are in, so the bot never answers the same issue twice concurrently.
+
+    Non-critical events are shed under load. They are rejected when their repository already
+    has `max_pending` events queued, normal events that waited longer than the SLO are deferred
+    to the low lane, and low lane events that waited longer than `drop_after_seconds` are dropped.
+    Critical events are never shed.
+    """
+
+    def __init__(
+        self,
+        repo_limits: Optional[Dict[str, dict]] = None,
+        installation_weights: Optional[Dict[str, float]] = None,
+        default_max_pending_per_repo: int = ADMISSION_DEFAULT_MAX_PENDING_PER_REPO,
+        queue_wait_slo_seconds: float = ADMISSION_QUEUE_WAIT_SLO_SECONDS,
+        drop_after_seconds: float = ADMISSION_DROP_AFTER_SECONDS,
+    ):
+        self.repo_limits = repo_limits if repo_limits is not None else ADMISSION_REPO_LIMITS
+        self.installation_weights = installation_weights if installation_weights is not None else ADMISSION_INSTALLATION_WEIGHTS
+        self.default_max_pending_per_repo = default_max_pending_per_repo
+        self.queue_wait_slo_seconds = queue_wait_slo_seconds
+        self.drop_after_seconds = drop_after_seconds
+
+        self.counters: Counter = Counter()
+        self._lanes: Dict[str, _Lane] = {lane: _Lane() for lane in LANES}
+        self._pending: Counter = Counter()
+        self._queued_per_issue: Dict[str, Deque[int]] = {}
+        self._in_flight_issues: Set[str] = set()
+        self._sequence = itertools.count()
+        self._not_empty = asyncio.Condition()
+
+    @staticmethod
+    def lane_for(event_action: str) -> str:
+        return EVENT_ACTION_LANES.get(event_action, LOW_LANE)
+
+    def _repo_weight(self, repo: str) -> float:
+        return float(self.repo_limits.get(repo, {}).get("weight", 1))
+
+    def _repo_max_pending(self, repo: str) -> int:
+        return int(self.repo_limits.get(repo, {}).get("max_pending", self.default_max_pending_per_repo))
+
+    def _installation_weight(self, installation_id: str) -> float:
+        return float(self.installation_weights.get(installation_id, 1))
+
+    def _push(self, event: QueuedEvent, lane_name: str):
+        """Appends the event to its repository's queue without charging any virtual time"""
+        lane = self._lanes[lane_name]
+
+        installation = lane.installations.get(event.installation_id)
+        if installation is None:
+            installation = _InstallationQueue(lane.virtual_time)
+            lane.installations[event.installation_id] = installation
+
+        repo_queue = installation.repos.get(event.repo)
+        if repo_queue is None:
+            repo_queue = _RepoQueue(installation.virtual_time)
+            installation.repos[event.repo] = repo_queue
+
+        repo_queue.events.append(event)
+
+    def _remove(self, lane: _Lane, installation_id: str, repo: str, index: int):
+        installation = lane.installations[installation_id]
+        repo_queue = installation.repos[repo]
+        del repo_queue.events[index]
+
+        if not repo_queue.events:
+            del installation.repos[repo]
+        if not installation.repos:
+            del lane.installations[installation_id]
+
+    def _forget_issue_sequence(self, event: QueuedEvent):
+        sequences = self._queued_per_issue[event.issue_url]
+        sequences.remove(event.sequence)
+        if not sequences:
+            del self._queued_per_issue[event.issue_url]
+
+    def _shed(self, event: QueuedEvent, reason: str):
+        self._pending[event.repo] -= 1
+        self._forget_issue_sequence(event)
+        self.counters[f"{reason}:{event.lane}"] += 1
+        logging.warning(f"(ADMISSION) {reason.capitalize()} {event.event_action} for {event.repo}")
+
+    def _is_ready(self, event: QueuedEvent) -> bool:
+        return (
+            event.issue_url not in self._in_flight_issues
+            and self._queued_per_issue[event.issue_url][0] == event.sequence
+        )
+
+    def _take_from_repo(self, lane_name: str, installation_id: str, repo: str, now: float) -> Optional[QueuedEvent]:
+        """Returns the first event of the repository that can run, shedding stale events on the way"""
+        lane = self._lanes[lane_name]
+        repo_queue = lane.installations[installation_id].repos[repo]
+
+        index = 0
+        while index < len(repo_queue.events):
+            event = repo_queue.events[index]
+            waited = now - event.enqueued_at
+
+            if lane_name == NORMAL_LANE and waited > self.queue_wait_slo_seconds:
+                self.counters[f"deferred:{event.lane}"] += 1
+                event.deferred = True
+                event.lane = LOW_LANE
+                self._remove(lane, installation_id, repo, index)
+                self._push(event, LOW_LANE)
+            elif lane_name == LOW_LANE and waited > self.drop_after_seconds:
+                self._remove(lane, installation_id, repo, index)
+                self._shed(event, "dropped")
+            elif self._is_ready(event):
+                self._remove(lane, installation_id, repo, index)
+                return event
+            else:
+                index += 1
+
+            installation = lane.installations.get(installation_id)
+            if installation is None or repo not in installation.repos:
+                break
+        return None
+
+    def _pop_ready(self) -> Optional[QueuedEvent]:
+        now = time.monotonic()
+        for lane_name in LANES:
+            lane = self._lanes[lane_name]
+            for installation_id, installation in sorted(lane.installations.items(), key=lambda item: item[1].tag):
+                for repo, repo_queue in sorted(installation.repos.items(), key=lambda item: item[1].tag):
+                    repo_tag = repo_queue.tag
+                    event = self._take_from_repo(lane_name, installation_id, repo, now)
+                    if event is None:
+                        continue
+
+                    lane.virtual_time = installation.tag
+                    installation.tag += 1 / self._installation_weight(installation_id)
+                    installation.virtual_time = repo_tag
+                    repo_queue.tag += 1 / self._repo_weight(repo)
+
+                    self._forget_issue_sequence(event)
+                    self._in_flight_issues.add(event.issue_url)
+                    return event
+        return None
+
+    async def submit(
+        self,
+        repo: str,
+        installation_id: str,
+        issue_url: str,
+        event_action: str,
+        job: Callable[[], None],
+    ) -> bool:
+        """Queues a job for the event
+
+        :param job: A blocking callable, run on a worker thread once the event is scheduled
+        :ptype: Callable
+
+        :returns: False if the event was rejected because its repository is over its limit
+        :rtype: bool
+        """
+        lane = self.lane_for(event_action)
+
+        if lane != CRITICAL_LANE and self._pending[repo] >= self._repo_max_pending(repo):
+            self.counters[f"rejected:{lane}"] += 1
+            logging.warning(f"(ADMISSION) Rejected {event_action} for {repo}: {self._pending[repo]} event(s) pending")
+            return False
+
+        async with self._not_empty:
+            event = QueuedEvent(repo, installation_id, issue_url, event_action, lane, job, next(self._sequence))
+            self._pending[repo] += 1
+            self._queued_per_issue.setdefault(issue_url, deque()).append(event.sequence)
+            self.counters[f"admitted:{lane}"] += 1
+            self._push(event, lane)
+            self._not_empty.notify_all()
+        return True
+
+    async def next_event(self) -> QueuedEvent:
+        async with self._not_empty:
+            while True:
+                event = self._pop_ready()
+                if event is not None:
+                    return event
+                await self._not_empty.wait()
+
+    async def _finish(self, event: QueuedEvent):
+        async with self._not_empty:
+            self._pending[event.repo] -= 1
+            self._in_flight_issues.discard(event.issue_url)
+            # Events of this issue may have been skipped while it was in flight
+            self._not_empty.notify_all()
+
+    async def run_worker(self):
+        while True:
+            event = await self.next_event()
+            waited = time.monotonic() - event.enqueued_at
+            logging.info(f"(ADMISSION) Running {event.event_action} for {event.repo} after {waited:.2f}s in {event.lane} lane")
+
+            try:
+                await asyncio.to_thread(event.job)
+                self.counters[f"processed:{event.lane}"] += 1
+            except asyncio.CancelledError:
+                self.counters[f"lost:{event.lane}"] += 1
+                logging.warning(f"(ADMISSION) Lost {event.event_action} for {event.repo}: worker cancelled while running it")
+                raise
+            except Exception as e:
+                self.counters[f"processed:{event.lane}"] += 1
+                logging.exception(f"Failed to process {event.event_action} for {event.repo}: {e}")
+            finally:
+                await self._finish(event)
+
+    def _queued_counts(self) -> Dict[str, int]:
+        return {
+            lane_name: sum(
+                len(repo_queue.events)
+                for installation in lane.installations.values()
+                for repo_queue in installation.repos.values()
+            )
+            for lane_name, lane in self._lanes.items()
+        }
+
+    def _is_idle(self) -> bool:
+        return not self._in_flight_issues and not any(lane.installations for lane in self._lanes.values())
+
+    async def shutdown(self, workers: List[asyncio.Task], timeout: float = ADMISSION_SHUTDOWN_TIMEOUT_SECONDS):
+        """
+        Lets the workers drain the queue for up to `timeout` seconds, then cancels and awaits them.
+        Events that were already acknowledged to GitHub but never ran are counted as lost.
+        """
+        try:
+            async with self._not_empty:
+                await asyncio.wait_for(self._not_empty.wait_for(self._is_idle), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"(ADMISSION) Queue not drained within {timeout}s of shutdown")
+
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        for lane_name, count in self._queued_counts().items():
+            if count:
+                self.counters[f"lost:{lane_name}"] += count
+                logging.warning(f"(ADMISSION) Lost {count} queued event(s) from the {lane_name} lane on shutdown")
+
+    def stats(self) -> dict:
+        """Aggregate queue depths and counters, without naming any repository"""
+        return {
+            "queued": self._queued_counts(),
+            "in_flight_issues": len(self._in_flight_issues),
+            "counters": dict(self.counters),
+        }
+
+
+admission_controller = AdmissionController()
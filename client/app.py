@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 import os
 import sys
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 import uvicorn
 from dotenv import load_dotenv
@@ -16,59 +18,109 @@ logging.basicConfig(level=logging.INFO, format="%(levelname)s:\t  %(message)s")
 from core import utils
 from core.agent import graph
 from core.state import AgentState
+from core.duplicates import duplicate_index, INDEXED_EVENT_ACTIONS
 from client.services import github
+from client.admission import admission_controller, ADMISSION_WORKERS
 
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8080"))
 ENV = os.getenv("ENV", "development")
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    workers = [asyncio.create_task(admission_controller.run_worker()) for _ in range(ADMISSION_WORKERS)]
+    logging.info(f"Started {len(workers)} admission worker(s)")
+    yield
+    await admission_controller.shutdown(workers)
 
-@app.post('/github-webhook', summary="Webhook deliveries")
-async def webhook(request: Request):
-    github_event = request.headers.get('x-github-event', None)
-    logging.info(f"(GITHUB-WEBHOOK-EVENT) Received Event: {github_event}")
 
-    if github_event == "ping":
-        logging.info("(GITHUB-WEBHOOK-EVENT) This is a test event that github sends")
-        return JSONResponse(content={"message": "Content Received"}, status_code=status.HTTP_202_ACCEPTED)
+app = FastAPI(lifespan=lifespan)
 
-    payload = await request.json()
-    github_current_action = payload.get('action', None)
 
-    logging.info(f"(GITHUB-WEBHOOK-PAYLOAD) Received Event-Action: {github_event}:{github_current_action}")
+def index_issue_for_duplicates(repo: str, github_event_action: str, issue: dict):
+    """Indexes the issue from the webhook payload for duplicate detection when it is opened or edited"""
+    if github_event_action not in INDEXED_EVENT_ACTIONS or not repo or issue.get("pull_request"):
+        return
 
-    issue = payload.get("issue")
-    issue_url = issue.get("url", "")
+    try:
+        duplicate_index.upsert_issue(repo, issue)
+    except Exception as e:
+        logging.exception(f"Failed to index issue {issue.get('url')} for duplicate detection: {e}")
 
+
+def process_github_event(github_event_action: str, issue: dict):
+    """Fetches the issue comments and runs the agent graph for an admitted event"""
+    issue_url = issue.get("url", "")
     comments_url = issue.get("comments_url", "")
 
-    messages = []
     try:
         logging.info(f"Getting Issue Comments with URL: {comments_url}")
         comments = github.get_data_from_github(comments_url)
         messages = utils.construct_messages_from_comments(comments)
     except Exception as e:
         logging.exception(f"Failed to get comments for url {comments_url}: {e}")
-        return JSONResponse(content={"message": f"Unable to get comments from url {comments_url}"}, status_code=status.HTTP_400_BAD_REQUEST)
+        return
 
-    github_event_action = f"{github_event}:{github_current_action}"
     input_payload: AgentState = {
         "issue_url": issue_url,
         "comments_url": comments_url,
         "event_action": github_event_action,
         "valid_description_on_issue": True,
         "validation_error_reasons": [],
+        "duplicate_issues": [],
         "messages": messages,
         "should_continue": True,
     }
 
     if not utils.check_last_message_is_a_bot(messages):
         graph.invoke(input_payload)
+
+
+@app.post('/github-webhook', summary="Webhook deliveries")
+async def webhook(request: Request):
+    github_event = request.headers.get('x-github-event', None)
+    logging.info(f"(GITHUB-WEBHOOK-EVENT) Received Event: {github_event}")
+
+    if github_event == "ping":
+        logging.info("(GITHUB-WEBHOOK-EVENT) This is a test event that github sends")
+        return JSONResponse(content={"message": "Content Received"}, status_code=status.HTTP_202_ACCEPTED)
+
+    payload = await request.json()
+    github_current_action = payload.get('action', None)
+
+    logging.info(f"(GITHUB-WEBHOOK-PAYLOAD) Received Event-Action: {github_event}:{github_current_action}")
+
+    issue = payload.get("issue")
+    if not issue:
+        return JSONResponse(content={"message": "Event ignored"}, status_code=status.HTTP_202_ACCEPTED)
+
+    repo = (payload.get("repository") or {}).get("full_name") or utils.get_repository_from_issue_url(issue.get("url"))
+    installation_id = str((payload.get("installation") or {}).get("id", ""))
+
+    github_event_action = f"{github_event}:{github_current_action}"
+
+    # Indexed before admission so the vector stays current even if the event itself is shed
+    await asyncio.to_thread(index_issue_for_duplicates, repo, github_event_action, issue)
+
+    admitted = await admission_controller.submit(
+        repo,
+        installation_id,
+        issue.get("url", ""),
+        github_event_action,
+        lambda: process_github_event(github_event_action, issue),
+    )
+
+    if not admitted:
+        return JSONResponse(content={"message": "Event dropped due to load"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
     return JSONResponse(content={"message": "Content received"}, status_code=status.HTTP_202_ACCEPTED)
 
 
+@app.get('/admission-stats', summary="Admission queue depths and shedding counters")
+async def admission_stats():
+    return JSONResponse(content=admission_controller.stats(), status_code=status.HTTP_200_OK)
+
+
 if __name__ == '__main__':
     IS_DEVELOPMENT = ENV == "development"
 
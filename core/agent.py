@@ -30,6 +30,7 @@ graph_builder = StateGraph(AgentState)
 graph_builder.add_node("tools", tool_node)
 graph_builder.add_node("react_to_github_event", chains.react_to_github_event)
 graph_builder.add_node("validate_issue_description", chains.validate_issue_description)
+graph_builder.add_node("detect_duplicate_issues", chains.detect_duplicate_issues)
 graph_builder.add_node("respond_to_user_query", chains.respond_to_user_query)
 
 
@@ -40,7 +41,8 @@ graph_builder.add_conditional_edges(
     )
 
 graph_builder.add_edge("tools", "validate_issue_description")
-graph_builder.add_edge("validate_issue_description", "respond_to_user_query")
+graph_builder.add_edge("validate_issue_description", "detect_duplicate_issues")
+graph_builder.add_edge("detect_duplicate_issues", "respond_to_user_query")
 graph_builder.add_conditional_edges(
         "respond_to_user_query",
         custom_tools_condition,
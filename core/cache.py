@@ -0,0 +1,186 @@
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+RESPONSE_CACHE_MAX_ENTRIES_PER_REPO = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES_PER_REPO", "256"))
+RESPONSE_CACHE_MAX_REPOS = int(os.getenv("RESPONSE_CACHE_MAX_REPOS", "128"))
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY_THRESHOLD", "0.75"))
+
+_MENTION_PATTERN = re.compile(r"@[\w-]+")
+_CODE_BLOCK_PATTERN = re.compile(r"```.*?```", re.DOTALL)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+_STOP_WORDS = frozenset({
+    "a", "about", "an", "and", "any", "are", "be", "can", "could", "do", "does", "for", "from", "here", "hi",
+    "hello", "in", "is", "issue", "it", "just", "me", "my", "now", "of", "on", "please", "should", "still",
+    "tell", "the", "thanks", "there", "this", "to", "you",
+})
+# Question words, negations and the user acting themselves change the answer, so two comments
+# only match when they share exactly the same set of these
+_DISCRIMINATOR_WORDS = frozenset({
+    "what", "why", "how", "when", "where", "which", "who",
+    "not", "no", "never", "cannot", "nothing", "none", "without",
+    "i", "we",
+})
+_CONTRACTIONS = (("can't", "cannot"), ("won't", "will not"), ("n't", " not"))
+
+
+def _query_terms(text: str | None) -> Tuple[frozenset, frozenset]:
+    """Splits a user comment into its discriminator words and its remaining content words"""
+    text = (text or "").lower().replace("\u2019", "'")
+    text = _CODE_BLOCK_PATTERN.sub(" ", text)
+    text = _MENTION_PATTERN.sub(" ", text)
+    for contraction, expansion in _CONTRACTIONS:
+        text = text.replace(contraction, expansion)
+
+    words = {token.split("'")[0] for token in _TOKEN_PATTERN.findall(text)} - _STOP_WORDS - {""}
+    return frozenset(words & _DISCRIMINATOR_WORDS), frozenset(words - _DISCRIMINATOR_WORDS)
+
+
+def normalize_query(text: str | None) -> str:
+    """Reduces a user comment to its content words so trivially different phrasings share a cache key.
+
+    :param text: The raw comment body
+    :ptype: str
+
+    :returns: The sorted content and discriminator words of the comment joined by spaces
+    :rtype: str
+    """
+    discriminators, content = _query_terms(text)
+    return " ".join(sorted(discriminators | content))
+
+
+def _jaccard_similarity(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class ResponseCache:
+    """
+    Per-repository cache of bot replies keyed by the validation verdict, the sorted validation
+    error reasons, a fingerprint of the issue context the reply was generated from and the words
+    of the latest user comment.
+
+    Lookups fall back to a nearest-neighbor search within the same verdict, reasons and context,
+    accepting the comment with the highest Jaccard similarity of content words above the threshold.
+    Question words, negations and first person pronouns must match exactly, so "is my issue valid?"
+    never answers "why is my issue not valid?" and "can I fix it?" never answers "can you fix it?".
+    Entries expire after the TTL and each repository evicts its least recently used entry
+    once it holds more than the configured maximum.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries_per_repo: int = RESPONSE_CACHE_MAX_ENTRIES_PER_REPO,
+        max_repos: int = RESPONSE_CACHE_MAX_REPOS,
+        similarity_threshold: float = RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_repo = max_entries_per_repo
+        self.max_repos = max_repos
+        self.similarity_threshold = similarity_threshold
+
+        self._repos: "OrderedDict[str, OrderedDict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _make_key(is_valid: bool, reasons: List[str] | None, context: str, normalized_query: str) -> Tuple:
+        return (bool(is_valid), tuple(sorted(reasons or [])), context, normalized_query)
+
+    def _get_repo_entries(self, repo: str, create: bool = False) -> Optional[OrderedDict]:
+        entries = self._repos.get(repo)
+        if entries is None and create:
+            entries = OrderedDict()
+            self._repos[repo] = entries
+            if len(self._repos) > self.max_repos:
+                self._repos.popitem(last=False)
+        if entries is not None:
+            self._repos.move_to_end(repo)
+        return entries
+
+    def _evict_expired(self, entries: OrderedDict, now: float):
+        expired = [key for key, (stored_at, _, _, _) in entries.items() if now - stored_at > self.ttl_seconds]
+        for key in expired:
+            del entries[key]
+
+    def get(
+        self,
+        repo: str,
+        is_valid: bool,
+        reasons: List[str] | None,
+        query: str | None,
+        context: str = "",
+    ) -> Optional[str]:
+        """Looks up a cached reply for a user comment.
+
+        :param repo: The repository the comment belongs to, e.g. `owner/name`
+        :ptype: str
+        :param context: Fingerprint of the issue content the reply depends on
+        :ptype: str
+
+        :returns: The cached reply, or None on a miss
+        :rtype: str | None
+        """
+        discriminators, content = _query_terms(query)
+        if not discriminators and not content:
+            return None
+
+        key = self._make_key(is_valid, reasons, context, normalize_query(query))
+        now = time.monotonic()
+
+        with self._lock:
+            entries = self._get_repo_entries(repo)
+            if not entries:
+                return None
+
+            self._evict_expired(entries, now)
+
+            best_key, best_similarity = None, 0.0
+            if key in entries:
+                best_key, best_similarity = key, 1.0
+            else:
+                for candidate_key, (_, candidate_discriminators, candidate_content, _) in entries.items():
+                    if candidate_key[:3] != key[:3] or candidate_discriminators != discriminators:
+                        continue
+                    similarity = _jaccard_similarity(content, candidate_content)
+                    if similarity > best_similarity:
+                        best_key, best_similarity = candidate_key, similarity
+
+            if best_key is None or best_similarity < self.similarity_threshold:
+                return None
+
+            entries.move_to_end(best_key)
+            logging.info(f"(RESPONSE-CACHE) Hit for {repo} with similarity {best_similarity:.2f}")
+            return entries[best_key][3]
+
+    def set(
+        self,
+        repo: str,
+        is_valid: bool,
+        reasons: List[str] | None,
+        query: str | None,
+        reply: str,
+        context: str = "",
+    ):
+        """Stores the reply generated for a user comment."""
+        discriminators, content = _query_terms(query)
+        if (not discriminators and not content) or not reply:
+            return
+
+        key = self._make_key(is_valid, reasons, context, normalize_query(query))
+
+        with self._lock:
+            entries = self._get_repo_entries(repo, create=True)
+            entries[key] = (time.monotonic(), discriminators, content, reply)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries_per_repo:
+                entries.popitem(last=False)
+
+
+response_cache = ResponseCache()
@@ -1,10 +1,15 @@
 import json
+import hashlib
 import logging
 from typing import List
 
 from langchain.chat_models import init_chat_model
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 
+from core import utils
+from core.cache import response_cache
+from core.duplicates import duplicate_index, strip_issue_template, INDEXED_EVENT_ACTIONS
 from core.state import AgentState
 from core.tools import get_data_from_github, post_issue_comment_on_github
 from core.prompt_templates import ISSUE_DESCRIPTION_TEMPLATE
@@ -38,6 +43,31 @@ def _extract_issue_from_messages(messages) -> dict:
     return {}
 
 
+def _get_latest_user_comment(messages) -> str | None:
+    """Returns the content of the most recent comment made by a user, if any"""
+    for msg in reversed(messages or []):
+        if isinstance(msg, HumanMessage) and isinstance(msg.content, str):
+            return msg.content
+    return None
+
+
+def _extract_comment_body_from_tool_calls(ai_message) -> str | None:
+    """Returns the comment body the LLM asked to post, if it requested one"""
+    for tool_call in getattr(ai_message, "tool_calls", None) or []:
+        if tool_call.get("name") == post_issue_comment_on_github.name:
+            return (tool_call.get("args") or {}).get("body")
+    return None
+
+
+def _issue_context_fingerprint(issue_body: str | None) -> str:
+    """
+    Fingerprints the parts of an issue body a reply may quote, ignoring text copied from the template
+    and whitespace, so cached replies are only shared between issues with the same description
+    """
+    content = " ".join(strip_issue_template(issue_body).split())
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
 def _llm_validate_issue_body(body: str | None, issue_url: str) -> dict:
     """Validates the structure and content of a GitHub issue body against a predefined template.
 
@@ -157,6 +187,33 @@ def validate_issue_description(state: AgentState):
     return { "valid_description_on_issue": is_valid, "validation_error_reasons": reasons }
 
 
+def detect_duplicate_issues(state: AgentState):
+    """
+    Looks up older issues of the same repository that look like duplicates of the fetched issue
+    Only runs when the issue is opened or edited, the index itself is updated from the webhook payload
+    """
+    logging.info("(LANGGRAPH_NODE) Detect Duplicate Issues")
+
+    if state.get("should_continue") is False or state.get("event_action") not in INDEXED_EVENT_ACTIONS:
+        return {}
+
+    issue = _extract_issue_from_messages(state.get("messages", []))
+    repo = utils.get_repository_from_issue_url(state.get("issue_url"))
+
+    if not issue or not repo or issue.get("pull_request"):
+        return {}
+
+    try:
+        duplicate_issues = duplicate_index.find_duplicates(repo, issue)
+    except Exception as e:
+        logging.exception("Failed to detect duplicate issues: %s", e)
+        return {}
+
+    if duplicate_issues:
+        logging.info(f"Found {len(duplicate_issues)} possible duplicate(s) for {state.get('issue_url')}")
+    return { "duplicate_issues": duplicate_issues }
+
+
 def respond_to_user_query(state: AgentState):
     """
     Responds to the quest query
@@ -167,11 +224,31 @@ def respond_to_user_query(state: AgentState):
         return {}
 
     valid_description_on_issue = state.get("valid_description_on_issue")
-    validation_error_reasons = state.get("reasons")
+    validation_error_reasons = state.get("validation_error_reasons")
+    duplicate_issues = state.get("duplicate_issues") or []
     messages = state.get("messages")
 
+    repo = utils.get_repository_from_issue_url(state.get("issue_url"))
+    latest_user_comment = _get_latest_user_comment(messages)
+
     issue = _extract_issue_from_messages(messages)
     issue_body = issue.get("body", "")
+    issue_context = _issue_context_fingerprint(issue_body)
+
+    # Replies are generated with the issue body in the prompt and may quote it, so they are only shared
+    # between issues whose description is the same once template text is removed (e.g. left empty).
+    # Replies that point at duplicates are specific to this issue, and an unparsable repo would share
+    # one cache bucket with other repos.
+    use_response_cache = bool(repo) and bool(latest_user_comment) and not duplicate_issues
+
+    cached_reply = None
+    if use_response_cache:
+        cached_reply = response_cache.get(
+            repo, valid_description_on_issue, validation_error_reasons, latest_user_comment, issue_context
+        )
+    if cached_reply and utils.post_issue_comment(state.get("comments_url"), cached_reply):
+        logging.info("Posted cached reply without calling the LLM")
+        return { "messages": [AIMessage(content=cached_reply)], "should_continue": False }
 
     if valid_description_on_issue:
         system_message = (
@@ -193,6 +270,16 @@ def respond_to_user_query(state: AgentState):
             f"Issue description:\n{(issue_body or '').strip()}"
         )
 
+    if duplicate_issues:
+        duplicates_text = "\n".join(
+            f"- #{duplicate['number']} (similarity {duplicate['similarity']})" for duplicate in duplicate_issues
+        )
+        system_message += (
+            "\n\nThe following existing issues in this repository look like possible duplicates. "
+            "At the end of your response, mention them so the user can check whether their issue is already reported:\n"
+            f"{duplicates_text}"
+        )
+
     user_message = (
         f"Create a new comment using {state.get('comments_url')} with the body as the response you generated."
     )
@@ -204,6 +291,15 @@ def respond_to_user_query(state: AgentState):
     messages = prompt_template.format_messages()
     ai_message = llm_with_tools.invoke(messages)
 
+    reply = _extract_comment_body_from_tool_calls(ai_message)
+    # Post here instead of through the tool node so the reply is only cached once it was posted.
+    # If posting fails, the tool call is returned untouched so the tool node can still post it.
+    if reply and use_response_cache and utils.post_issue_comment(state.get("comments_url"), reply):
+        response_cache.set(
+            repo, valid_description_on_issue, validation_error_reasons, latest_user_comment, reply, issue_context
+        )
+        return { "messages": [AIMessage(content=reply)], "should_continue": False }
+
     return { "messages": [ai_message], "should_continue": False }
 
 
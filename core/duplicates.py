@@ -0,0 +1,280 @@
+import os
+import re
+import zlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from core.prompt_templates import ISSUE_DESCRIPTION_TEMPLATE
+
+DUPLICATE_INDEX_DIR = os.getenv("DUPLICATE_INDEX_DIR", "data/duplicate_index")
+DUPLICATE_INDEX_DIMENSIONS = int(os.getenv("DUPLICATE_INDEX_DIMENSIONS", "1024"))
+DUPLICATE_INDEX_SIGNATURE_BITS = int(os.getenv("DUPLICATE_INDEX_SIGNATURE_BITS", "256"))
+DUPLICATE_RERANK_CANDIDATES = int(os.getenv("DUPLICATE_RERANK_CANDIDATES", "256"))
+DUPLICATE_INDEX_INITIAL_CAPACITY = int(os.getenv("DUPLICATE_INDEX_INITIAL_CAPACITY", "256"))
+DUPLICATE_SIMILARITY_THRESHOLD = float(os.getenv("DUPLICATE_SIMILARITY_THRESHOLD", "0.6"))
+DUPLICATE_TOP_K = int(os.getenv("DUPLICATE_TOP_K", "3"))
+
+INDEXED_EVENT_ACTIONS = ("issues:opened", "issues:edited")
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_EMPTY_ROW = -1
+_SIGNATURE_SEED = 20250801
+_STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "how", "i", "if", "in", "into",
+    "is", "it", "its", "my", "of", "on", "or", "so", "that", "the", "this", "to", "via", "was", "we",
+    "when", "with",
+})
+_TEMPLATE_LINES = frozenset(
+    line.strip().lower() for line in ISSUE_DESCRIPTION_TEMPLATE.splitlines() if line.strip()
+)
+_TEMPLATE_LABELS = tuple(line for line in _TEMPLATE_LINES if line.endswith(":"))
+
+
+def strip_issue_template(body: str | None) -> str:
+    """Removes the issue template's headings, placeholder lines and field labels from a body"""
+    lines = []
+    for line in (body or "").splitlines():
+        normalized = line.strip().lower()
+        if normalized in _TEMPLATE_LINES:
+            continue
+        for label in _TEMPLATE_LABELS:
+            if normalized.startswith(label):
+                normalized = normalized[len(label):]
+                break
+        lines.append(normalized)
+    return "\n".join(lines)
+
+
+def _tokenize(text: str | None) -> List[str]:
+    tokens = [token for token in _TOKEN_PATTERN.findall((text or "").lower()) if token not in _STOP_WORDS]
+    bigrams = [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    return tokens + bigrams
+
+
+def embed_issue(title: str | None, body: str | None, dimensions: int = DUPLICATE_INDEX_DIMENSIONS) -> np.ndarray:
+    """Embeds an issue with a signed hashing vectorizer over unigrams and bigrams.
+
+    The title is counted twice since it usually carries most of the signal. Text copied from the
+    issue template is removed from the body first, so untouched placeholders do not match each other.
+
+    :param title: The issue title
+    :ptype: str
+    :param body: The issue body
+    :ptype: str
+
+    :returns: An L2 normalized vector, all zeros if the issue has no text
+    :rtype: np.ndarray
+    """
+    tokens = _tokenize(title) * 2 + _tokenize(strip_issue_template(body))
+    if not tokens:
+        return np.zeros(dimensions, dtype=np.float32)
+
+    hashes = np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens), dtype=np.uint32, count=len(tokens))
+    indices = (hashes % dimensions).astype(np.intp)
+    signs = np.where(hashes >> 31, -1.0, 1.0)
+
+    vector = np.bincount(indices, weights=signs, minlength=dimensions).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class RepositoryIndex:
+    """
+    Issue vectors of a single repository, stored as memory-mapped `.npy` files.
+
+    `vectors.npy` holds one float16 row per issue, `signatures.npy` a SimHash signature of each row
+    (the signs of random projections, packed into uint64 words) and `numbers.npy` the matching issue
+    numbers, with unused rows marked as -1. Rows are appended when an issue is first seen and
+    overwritten in place when it is edited; the files double in capacity when full.
+
+    A search scans the signatures by Hamming distance, which tracks the angle between vectors, and
+    only reranks the closest candidates by exact cosine similarity, so a lookup reads 32 bytes per
+    issue instead of the full vector.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dimensions: int = DUPLICATE_INDEX_DIMENSIONS,
+        signature_bits: int = DUPLICATE_INDEX_SIGNATURE_BITS,
+    ):
+        if signature_bits % 64:
+            raise ValueError(f"Signature bits must be a multiple of 64, got {signature_bits}")
+
+        self.path = path
+        self.dimensions = dimensions
+        self.signature_bits = signature_bits
+        self._projections = np.random.default_rng(_SIGNATURE_SEED).standard_normal(
+            (signature_bits, dimensions), dtype=np.float32
+        )
+        self._vectors_path = os.path.join(path, "vectors.npy")
+        self._signatures_path = os.path.join(path, "signatures.npy")
+        self._numbers_path = os.path.join(path, "numbers.npy")
+        self._lock = threading.Lock()
+
+        paths = (self._vectors_path, self._signatures_path, self._numbers_path)
+        if all(os.path.exists(file_path) for file_path in paths):
+            self._vectors, self._signatures, self._numbers = (
+                np.lib.format.open_memmap(file_path, mode="r+") for file_path in paths
+            )
+            if self._vectors.shape[1] != dimensions or self._signatures.shape[1] * 64 != signature_bits:
+                raise ValueError(
+                    f"Index at {path} has {self._vectors.shape[1]} dimensions and {self._signatures.shape[1] * 64} "
+                    f"signature bits, expected {dimensions} and {signature_bits}"
+                )
+        else:
+            os.makedirs(path, exist_ok=True)
+            self._vectors, self._signatures, self._numbers = self._allocate(paths, DUPLICATE_INDEX_INITIAL_CAPACITY)
+
+        self.count = int(np.count_nonzero(self._numbers != _EMPTY_ROW))
+        self._rows: Dict[int, int] = {int(number): row for row, number in enumerate(self._numbers[:self.count])}
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, "numbers.npy"))
+
+    def _allocate(self, paths, capacity: int):
+        vectors_path, signatures_path, numbers_path = paths
+        vectors = np.lib.format.open_memmap(
+            vectors_path, mode="w+", dtype=np.float16, shape=(capacity, self.dimensions)
+        )
+        signatures = np.lib.format.open_memmap(
+            signatures_path, mode="w+", dtype=np.uint64, shape=(capacity, self.signature_bits // 64)
+        )
+        numbers = np.lib.format.open_memmap(numbers_path, mode="w+", dtype=np.int64, shape=(capacity,))
+        numbers[:] = _EMPTY_ROW
+        return vectors, signatures, numbers
+
+    def _signature(self, vector: np.ndarray) -> np.ndarray:
+        return np.packbits(self._projections @ vector > 0).view(np.uint64)
+
+    def _grow(self):
+        capacity = max(1, self._numbers.shape[0]) * 2
+        logging.info(f"(DUPLICATE-INDEX) Growing index at {self.path} to {capacity} rows")
+
+        paths = (self._vectors_path, self._signatures_path, self._numbers_path)
+        tmp_paths = tuple(f"{file_path}.tmp" for file_path in paths)
+        grown = self._allocate(tmp_paths, capacity)
+        for new, old in zip(grown, (self._vectors, self._signatures, self._numbers)):
+            new[:self.count] = old[:self.count]
+            new.flush()
+
+        del self._vectors, self._signatures, self._numbers
+        for tmp_path, file_path in zip(tmp_paths, paths):
+            os.replace(tmp_path, file_path)
+        self._vectors, self._signatures, self._numbers = grown
+
+    def upsert(self, number: int, vector: np.ndarray):
+        """Adds the vector of an issue, or replaces it if the issue is already indexed"""
+        signature = self._signature(vector)
+
+        with self._lock:
+            row = self._rows.get(number)
+            if row is None:
+                if self.count == self._numbers.shape[0]:
+                    self._grow()
+                row = self.count
+                self._numbers[row] = number
+                self._rows[number] = row
+                self.count += 1
+
+            self._vectors[row] = vector
+            self._signatures[row] = signature
+            for array in (self._vectors, self._signatures, self._numbers):
+                array.flush()
+
+    def search(self, vector: np.ndarray, k: int, threshold: float, before: Optional[int] = None) -> List[dict]:
+        """
+        Returns up to `k` issues whose cosine similarity to `vector` is at least `threshold`,
+        only considering issues numbered below `before` when it is given
+        """
+        if k <= 0 or not vector.any():
+            return []
+
+        signature = self._signature(vector)
+
+        with self._lock:
+            if self.count == 0:
+                return []
+
+            distances = np.bitwise_count(self._signatures[:self.count] ^ signature).sum(axis=1, dtype=np.int32)
+            if before is not None:
+                distances[self._numbers[:self.count] >= before] = self.signature_bits + 1
+
+            candidates = min(max(k, DUPLICATE_RERANK_CANDIDATES), self.count)
+            rows = np.argpartition(distances, candidates - 1)[:candidates]
+            rows = rows[distances[rows] <= self.signature_bits]
+
+            scores = self._vectors[rows].astype(np.float32) @ vector
+            order = np.argsort(-scores)[:k]
+            numbers = self._numbers[rows[order]]
+
+        return [
+            {"number": int(number), "similarity": round(float(score), 3)}
+            for number, score in zip(numbers, scores[order])
+            if score >= threshold
+        ]
+
+
+class DuplicateIssueIndex:
+    """
+    Keeps one `RepositoryIndex` per repository under a common directory.
+
+    The registry lock only guards opening an index, each index has its own lock, so a repository
+    that is growing its files does not block lookups in other repositories.
+    """
+
+    def __init__(self, directory: str = DUPLICATE_INDEX_DIR, dimensions: int = DUPLICATE_INDEX_DIMENSIONS):
+        self.directory = directory
+        self.dimensions = dimensions
+        self._indexes: Dict[str, RepositoryIndex] = {}
+        self._lock = threading.Lock()
+
+    def _get_index(self, repo: str, create: bool = False) -> Optional[RepositoryIndex]:
+        with self._lock:
+            index = self._indexes.get(repo)
+            if index is None:
+                path = os.path.join(self.directory, repo.replace("/", "__"))
+                if not create and not RepositoryIndex.exists(path):
+                    return None
+                index = RepositoryIndex(path, self.dimensions)
+                self._indexes[repo] = index
+            return index
+
+    def upsert_issue(self, repo: str, issue: dict):
+        """Indexes an issue payload as received from GitHub"""
+        number = issue.get("number")
+        if number is None:
+            return
+
+        vector = embed_issue(issue.get("title"), issue.get("body"), self.dimensions)
+        self._get_index(repo, create=True).upsert(int(number), vector)
+
+    def find_duplicates(
+        self,
+        repo: str,
+        issue: dict,
+        k: int = DUPLICATE_TOP_K,
+        threshold: float = DUPLICATE_SIMILARITY_THRESHOLD,
+    ) -> List[dict]:
+        """Finds older indexed issues of the same repository that look like duplicates of `issue`
+
+        :returns: A list of `{"number": int, "similarity": float}`, most similar first
+        :rtype: list[dict]
+        """
+        number = issue.get("number")
+        if number is None:
+            return []
+
+        index = self._get_index(repo)
+        if index is None:
+            return []
+
+        vector = embed_issue(issue.get("title"), issue.get("body"), self.dimensions)
+        return index.search(vector, k, threshold, before=int(number))
+
+
+duplicate_index = DuplicateIssueIndex()
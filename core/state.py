@@ -12,5 +12,6 @@ class AgentState(TypedDict):
     should_continue: bool
     valid_description_on_issue: bool
     validation_error_reasons: List[str]
+    duplicate_issues: List[dict]
     messages: Annotated[List[Union[AnyMessage, BaseMessage]], add_messages]
 
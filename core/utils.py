@@ -139,11 +139,12 @@ def post_issue_comment(comments_url: str | None, body: str) -> bool:
     if comments_url is None:
         return False
 
-    access_token = get_github_app_access_token()
-    headers = {**headers_without_authorization, "Authorization": f"Bearer {access_token}"}
     payload = {"body": body}
 
     try:
+        access_token = get_github_app_access_token()
+        headers = {**headers_without_authorization, "Authorization": f"Bearer {access_token}"}
+
         response = requests.post(comments_url, json=payload, headers=headers)
         response.raise_for_status()
     except Exception as e:
@@ -170,3 +171,20 @@ def check_last_message_is_a_bot(messages: List[AnyMessage]):
     if len(messages) == 0:
         return False
     return isinstance(messages[-1], AIMessage)
+
+
+def get_repository_from_issue_url(issue_url: str | None) -> str:
+    """Extracts the `owner/name` of the repository from a GitHub API issue url
+
+    :param issue_url: e.g. https://api.github.com/repos/owner/name/issues/1
+    :ptype: str
+    :returns: The repository full name, or an empty string if it cannot be parsed
+    """
+    parts = (issue_url or "").split("/repos/", 1)
+    if len(parts) != 2:
+        return ""
+
+    owner_and_name = parts[1].split("/")[:2]
+    if len(owner_and_name) != 2:
+        return ""
+    return "/".join(owner_and_name)